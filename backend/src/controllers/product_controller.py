@@ -1,16 +1,47 @@
 import logging
+import math
+import os
 
 from flask import Blueprint, jsonify, request
 from flasgger import swag_from
 from repositories.product_repository import ProductRepository
+from utils.request_control import ConcurrencyLimiter, OverloadedError, SingleFlight
+
+# One pool shared by all aggregate endpoints; each endpoint runs at most one leader at a time
+AGGREGATE_MAX_CONCURRENCY = int(os.getenv('AGGREGATE_MAX_CONCURRENCY', 1))
+AGGREGATE_QUEUE_TIMEOUT = float(os.getenv('AGGREGATE_QUEUE_TIMEOUT', 5))
+AGGREGATE_WAIT_TIMEOUT = float(os.getenv('AGGREGATE_WAIT_TIMEOUT', 30))
+AGGREGATE_RETRY_AFTER = int(os.getenv('AGGREGATE_RETRY_AFTER', 5))
+AGGREGATE_MAX_WAITERS = int(os.getenv('AGGREGATE_MAX_WAITERS', 32))
 
 class ProductController:
     def __init__(self, product_repository: ProductRepository):
         self.product_repository = product_repository
         self.logger = logging.getLogger(__name__)
         self.blueprint = Blueprint('products', __name__)
+        self.single_flight = SingleFlight(AGGREGATE_MAX_WAITERS)
+        self.limiter = ConcurrencyLimiter(
+            'aggregate', AGGREGATE_MAX_CONCURRENCY, AGGREGATE_QUEUE_TIMEOUT, AGGREGATE_RETRY_AFTER
+        )
         self._initialize_routes()
 
+    def _run_aggregate(self, endpoint, fetch):
+        """Share one in-flight computation between concurrent requests, within the aggregate pool's limit.
+
+        Neither aggregate endpoint takes parameters, so the key is the endpoint alone and
+        cache-busting query strings still coalesce. Leaders of different endpoints compete
+        for the shared pool, and followers beyond AGGREGATE_MAX_WAITERS are shed.
+        """
+        def compute():
+            with self.limiter.slot():
+                return fetch()
+
+        return self.single_flight.do(endpoint, compute, AGGREGATE_WAIT_TIMEOUT, self.limiter.retry_after)
+
+    def _overloaded_response(self, error):
+        self.logger.warning(f"Shedding request: {str(error)}")
+        return jsonify({"message": str(error)}), 503, {'Retry-After': str(error.retry_after)}
+
     def _initialize_routes(self):
         @self.blueprint.route('', methods=['GET'])
         @swag_from({
@@ -235,6 +266,15 @@ class ProductController:
                         }
                     }
                 },
+                503: {
+                    'description': 'Too many concurrent requests; retry after the number of seconds in the Retry-After header.',
+                    'schema': {
+                        'type': 'object',
+                        'properties': {
+                            'message': {'type': 'string', 'example': 'Too many concurrent aggregate requests'}
+                        }
+                    }
+                },
                 500: {
                     'description': 'Internal Server Error during fetching temporal trend data.',
                     'schema': {
@@ -249,8 +289,10 @@ class ProductController:
         def get_temporal_trend():
             """Fetch temporal trend of products for line chart."""
             try:
-                result = self.product_repository.get_temporal_trend()
+                result = self._run_aggregate('temporal-trend', self.product_repository.get_temporal_trend)
                 return jsonify(result['data']), 200
+            except OverloadedError as oe:
+                return self._overloaded_response(oe)
             except Exception as e:
                 self.logger.error(f"Error in get_temporal_trend: {str(e)}")
                 return jsonify({"message": str(e)}), 500
@@ -273,6 +315,15 @@ class ProductController:
                         }
                     }
                 },
+                503: {
+                    'description': 'Too many concurrent requests; retry after the number of seconds in the Retry-After header.',
+                    'schema': {
+                        'type': 'object',
+                        'properties': {
+                            'message': {'type': 'string', 'example': 'Too many concurrent aggregate requests'}
+                        }
+                    }
+                },
                 500: {
                     'description': 'Internal Server Error during fetching density heatmap data.',
                     'schema': {
@@ -287,12 +338,184 @@ class ProductController:
         def get_density_heatmap():
             """Fetch temporal trend of products for line chart."""
             try:
-                result = self.product_repository.get_density_heatmap()
+                result = self._run_aggregate('density-heatmap', self.product_repository.get_density_heatmap)
                 return jsonify(result['data']), 200
+            except OverloadedError as oe:
+                return self._overloaded_response(oe)
             except Exception as e:
                 self.logger.error(f"Error in get_temporal_trend: {str(e)}")
                 return jsonify({"message": str(e)}), 500
 
+        @self.blueprint.route('/length-quantiles', methods=['GET'])
+        @swag_from({
+            'parameters': [
+                {
+                    'name': 'quantiles',
+                    'in': 'query',
+                    'type': 'string',
+                    'default': '0.5,0.9',
+                    'description': 'Comma-separated ranks between 0 and 1.'
+                },
+                {
+                    'name': 'product_type_id',
+                    'in': 'query',
+                    'type': 'integer',
+                    'required': False,
+                    'description': 'Restrict the result to a single product type.'
+                }
+            ],
+            'responses': {
+                200: {
+                    'description': 'Approximate product_length quantiles and distinct title counts per product type.',
+                    'schema': {
+                        'type': 'object',
+                        'properties': {
+                            'dataset_version': {'type': 'string', 'description': 'Version of the dataset the sketches were built from'},
+                            'data': {
+                                'type': 'array',
+                                'items': {
+                                    'type': 'object',
+                                    'properties': {
+                                        'product_type_id': {'type': 'integer', 'description': 'The ID of the product type'},
+                                        'count': {'type': 'integer', 'description': 'Number of products of this type'},
+                                        'distinct_titles': {'type': 'integer', 'description': 'Estimated number of distinct titles'},
+                                        'quantiles': {'type': 'object', 'description': 'Estimated product_length keyed by rank'}
+                                    }
+                                }
+                            }
+                        }
+                    }
+                },
+                400: {
+                    'description': 'Invalid quantiles or product_type_id parameters.'
+                },
+                500: {
+                    'description': 'Internal Server Error during fetching length quantiles.',
+                    'schema': {
+                        'type': 'object',
+                        'properties': {
+                            'message': {'type': 'string', 'example': 'An error occurred while processing the request.'}
+                        }
+                    }
+                }
+            }
+        })
+        def get_length_quantiles():
+            """Fetch approximate product_length quantiles per product type from ingest-time sketches."""
+            try:
+                ranks = [float(rank) for rank in request.args.get('quantiles', '0.5,0.9').split(',')]
+                if not all(math.isfinite(rank) and 0 <= rank <= 1 for rank in ranks):
+                    raise ValueError("quantiles must be between 0 and 1")
+                product_type_id = request.args.get('product_type_id')
+                if product_type_id is not None:
+                    product_type_id = int(product_type_id)
+                result = self.product_repository.get_length_quantiles(ranks, product_type_id)
+                return jsonify(result), 200
+            except ValueError as ve:
+                self.logger.error(f"Invalid quantile parameters: {str(ve)}")
+                return jsonify({"message": "Invalid quantiles or product_type_id parameter"}), 400
+            except Exception as e:
+                self.logger.error(f"Error in get_length_quantiles: {str(e)}")
+                return jsonify({"message": str(e)}), 500
+
+        @self.blueprint.route('/duplicates', methods=['GET'])
+        @swag_from({
+            'responses': {
+                200: {
+                    'description': 'Near-duplicate product clusters, largest first.',
+                    'schema': {
+                        'type': 'object',
+                        'properties': {
+                            'data': {
+                                'type': 'array',
+                                'items': {
+                                    'type': 'object',
+                                    'properties': {
+                                        'duplicate_cluster_id': {'type': 'integer', 'description': 'The ID of the near-duplicate cluster'},
+                                        'size': {'type': 'integer', 'description': 'Number of products in the cluster'},
+                                        'sample_title': {'type': 'string', 'description': 'A title from the cluster'}
+                                    }
+                                }
+                            },
+                            'total': {'type': 'integer', 'description': 'Total number of clusters'}
+                        }
+                    }
+                },
+                400: {
+                    'description': 'Invalid page or pageSize parameters.'
+                },
+                500: {
+                    'description': 'Internal Server Error during fetching duplicate clusters.',
+                    'schema': {
+                        'type': 'object',
+                        'properties': {
+                            'message': {'type': 'string', 'example': 'An error occurred while processing the request.'}
+                        }
+                    }
+                }
+            }
+        })
+        def get_duplicates():
+            """Fetch near-duplicate product clusters with pagination."""
+            try:
+                page = int(request.args.get('page', 1))
+                page_size = int(request.args.get('pageSize', 50))
+                result = self.product_repository.get_duplicate_clusters(page, page_size)
+                return jsonify(result), 200
+            except ValueError as ve:
+                self.logger.error(f"Invalid pagination parameters: {str(ve)}")
+                return jsonify({"message": "Invalid page or pageSize parameters"}), 400
+            except Exception as e:
+                self.logger.error(f"Error in get_duplicates: {str(e)}")
+                return jsonify({"message": str(e)}), 500
+
+        @self.blueprint.route('/<product_id>/similar', methods=['GET'])
+        @swag_from({
+            'parameters': [
+                {
+                    'name': 'product_id',
+                    'in': 'path',
+                    'type': 'string',
+                    'required': True,
+                    'description': 'The product ID'
+                }
+            ],
+            'responses': {
+                200: {
+                    'description': 'Products in the same near-duplicate cluster as the given product.',
+                    'schema': {
+                        'type': 'object',
+                        'properties': {
+                            'duplicate_cluster_id': {'type': 'integer', 'description': 'The cluster of the product, null if it has no near duplicates'},
+                            'data': {'type': 'array', 'items': {'type': 'object'}}
+                        }
+                    }
+                },
+                404: {
+                    'description': 'Product not found.'
+                },
+                500: {
+                    'description': 'Internal Server Error during fetching similar products.',
+                    'schema': {
+                        'type': 'object',
+                        'properties': {
+                            'message': {'type': 'string', 'example': 'An error occurred while processing the request.'}
+                        }
+                    }
+                }
+            }
+        })
+        def get_similar_products(product_id):
+            """Fetch near-duplicates of a product."""
+            try:
+                result = self.product_repository.get_similar_products(product_id)
+                if result is None:
+                    return jsonify({"message": f"Product {product_id} not found"}), 404
+                return jsonify(result), 200
+            except Exception as e:
+                self.logger.error(f"Error in get_similar_products: {str(e)}")
+                return jsonify({"message": str(e)}), 500
+
     def get_blueprint(self):
         return self.blueprint
 
@@ -0,0 +1,13 @@
+from sqlalchemy import JSON, Column, DateTime, Float, Integer, Text
+
+from models.product_model import Base
+
+class IngestionRun(Base):
+    __tablename__ = 'ingestion_runs'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    started_at = Column(DateTime, nullable=False)
+    dataset_version = Column(Text)
+    total_seconds = Column(Float, nullable=False)
+    stage_seconds = Column(Float, nullable=False)
+    stages = Column(JSON, nullable=False)
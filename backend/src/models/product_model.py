@@ -13,6 +13,7 @@ class Product(Base):
     product_type_id = Column(Integer)
     product_length = Column(Float)
     empty_cols = Column(Text)
+    duplicate_cluster_id = Column(Integer)
     
     def to_dict(self):
         return {
@@ -22,5 +23,6 @@ class Product(Base):
             'description': self.description,
             'product_type_id': self.product_type_id,
             'product_length': self.product_length,
-            'empty_cols': self.empty_cols
+            'empty_cols': self.empty_cols,
+            'duplicate_cluster_id': self.duplicate_cluster_id
         }
@@ -0,0 +1,14 @@
+from sqlalchemy import Column, DateTime, Integer, LargeBinary, Text, func
+
+from models.product_model import Base
+
+class ProductSketch(Base):
+    __tablename__ = 'product_sketches'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    dataset_version = Column(Text, nullable=False, index=True)
+    product_type_id = Column(Integer, nullable=False)
+    row_count = Column(Integer, nullable=False)
+    length_sketch = Column(LargeBinary, nullable=False)
+    distinct_sketch = Column(LargeBinary, nullable=False)
+    created_at = Column(DateTime, server_default=func.now())
@@ -1,5 +1,6 @@
 import os
 import io
+import hashlib
 import logging
 import pandas as pd
 import time
@@ -13,6 +14,15 @@ from sqlalchemy.ext.declarative import declarative_base
 
 from repositories.base_repository import BaseRepository
 from models.product_model import Product
+from models.product_sketch_model import ProductSketch
+from models.ingestion_run_model import IngestionRun
+from utils.profiling import StageProfiler
+from utils.sketches import ProductTypeSketch, build_type_sketches, merge_type_sketches
+from utils.near_duplicates import CLUSTER_PARAMETERS, assign_duplicate_clusters
+
+# Bump whenever the cleaning logic changes so cached cleaned Parquet files are rebuilt
+CLEANING_VERSION = "2"
+CLEANED_ROW_GROUP_SIZE = 128 * 1024
 
 
 class ProductRepository(BaseRepository):
@@ -27,18 +37,119 @@ class ProductRepository(BaseRepository):
             )
 
     def clean_and_save_to_db(
-        self, parquet_path="./data/processed/amazon_product_data.parquet"
+        self, parquet_path="./data/processed/amazon_product_data.parquet", profiler=None
     ):
         """Clean data and save to Postgres"""
+        owns_profiler = profiler is None
+        profiler = profiler or StageProfiler()
+
         self.logger.info("Clearing existing products table...")
         with self.engine.connect() as conn:
             conn.execute(text("DROP TABLE IF EXISTS products"))
             conn.commit()
             self.logger.info("Products table dropped")
 
-        self.logger.info("Loading Parquet for cleaning...")
-        df = pd.read_parquet(parquet_path)
+        with profiler.stage("fingerprint"):
+            dataset_version = self._dataset_version(parquet_path)
+        profiler.metadata["dataset_version"] = dataset_version
+
+        cleaned_path = self._cleaned_parquet_path(parquet_path, dataset_version)
+        if os.path.exists(cleaned_path):
+            self.logger.info(f"Reusing cleaned Parquet {cleaned_path}. Skipping cleaning.")
+            with profiler.stage("read_cleaned"):
+                df = self._read_cleaned_parquet(cleaned_path)
+        else:
+            with profiler.stage("read"):
+                self.logger.info("Loading Parquet for cleaning...")
+                df = pd.read_parquet(parquet_path)
+            with profiler.stage("clean"):
+                df = self._clean_products(df)
+            with profiler.stage("dedupe"):
+                df["duplicate_cluster_id"] = assign_duplicate_clusters(
+                    df["title"] + " " + df["description"]
+                )
+            with profiler.stage("write_cleaned"):
+                self._write_cleaned_parquet(df, cleaned_path)
+
+        self._load_to_db(df, profiler)
+        with profiler.stage("sketches"):
+            self.save_sketches(dataset_version, build_type_sketches(df))
+
+        if owns_profiler:
+            self.save_ingestion_run(profiler)
+
+    def save_ingestion_run(self, profiler):
+        """Persist the stage breakdown of an ingestion run so runs can be compared"""
+        IngestionRun.__table__.create(self.engine, checkfirst=True)
+        with sessionmaker(bind=self.engine)() as session:
+            session.add(
+                IngestionRun(
+                    started_at=pd.Timestamp.fromtimestamp(profiler.started_at).to_pydatetime(),
+                    dataset_version=profiler.metadata.get("dataset_version"),
+                    total_seconds=profiler.wall_seconds,
+                    stage_seconds=profiler.stage_seconds,
+                    stages=profiler.stages,
+                )
+            )
+            session.commit()
+        breakdown = ", ".join(f"{s['stage']}={s['seconds']:.2f}s" for s in profiler.stages)
+        self.logger.info(
+            f"Ingestion finished in {profiler.wall_seconds:.2f}s, "
+            f"{profiler.stage_seconds:.2f}s in stages ({breakdown})"
+        )
+
+    def _cleaned_parquet_path(self, parquet_path, dataset_version):
+        """Cleaned-stage artifact keyed by the raw file fingerprint, cleaning code version and clustering parameters"""
+        key = hashlib.sha256(
+            f"{dataset_version}:{CLEANING_VERSION}:{CLUSTER_PARAMETERS}".encode()
+        ).hexdigest()[:16]
+        name = os.path.splitext(os.path.basename(parquet_path))[0]
+        return os.path.join(os.path.dirname(parquet_path), "cleaned", f"{name}_{key}.parquet")
+
+    def _write_cleaned_parquet(self, df, cleaned_path):
+        """Write the cleaned stage with row groups and encodings tuned for pruning"""
+        start_time = time.time()
+        os.makedirs(os.path.dirname(cleaned_path), exist_ok=True)
+        # Row groups are clustered by product_type_id for pruning; load_order keeps the
+        # original row order so a cache hit loads Postgres exactly like a cold run
+        df = df.assign(load_order=range(len(df))).sort_values("product_type_id", kind="stable")
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        tmp_path = f"{cleaned_path}.tmp"
+        pq.write_table(
+            table,
+            tmp_path,
+            row_group_size=CLEANED_ROW_GROUP_SIZE,
+            compression="zstd",
+            use_dictionary=["product_type_id", "empty_cols"],
+            write_statistics=True,
+        )
+        os.replace(tmp_path, cleaned_path)
+        self.logger.info(f"Saved cleaned Parquet to {cleaned_path} in {time.time() - start_time:.2f}s")
+        self._prune_cleaned_parquet(cleaned_path)
+
+    def _read_cleaned_parquet(self, cleaned_path):
+        """Read the cleaned stage back in the original row order"""
+        df = pd.read_parquet(cleaned_path)
+        return (
+            df.sort_values("load_order", kind="stable")
+            .drop(columns="load_order")
+            .reset_index(drop=True)
+        )
 
+    def _prune_cleaned_parquet(self, cleaned_path):
+        """Remove cleaned artifacts left by older fingerprints or cleaning versions"""
+        directory = os.path.dirname(cleaned_path)
+        name = os.path.basename(cleaned_path).rsplit("_", 1)[0]
+        # Exact match so another dataset such as products_v2_<key>.parquet is left alone
+        artifact = re.compile(rf"^{re.escape(name)}_[0-9a-f]{{16}}\.parquet(\.tmp)?$")
+        for entry in os.listdir(directory):
+            path = os.path.join(directory, entry)
+            if artifact.match(entry) and path != cleaned_path:
+                os.remove(path)
+                self.logger.info(f"Removed stale cleaned Parquet {path}")
+
+    def _clean_products(self, df):
+        """Apply text cleaning and null handling to the raw products"""
         text_cols = ["title", "bullet_points", "description"]
         numeric_cols = ["product_id", "product_type_id", "product_length"]
 
@@ -82,16 +193,22 @@ class ProductRepository(BaseRepository):
         )
 
         df[text_cols] = df[text_cols].apply(lambda x: x.str.lower())
+        return df
 
+    def _load_to_db(self, df, profiler):
+        """Bulk insert cleaned products and build indexes"""
         self.logger.info("Saving cleaned data to Postgres...")
         with self.engine.connect() as conn:
             conn.execute(text("DROP TABLE IF EXISTS products"))
             conn.commit()
         Product.__table__.create(self.engine)
 
+        # Nullable columns (duplicate_cluster_id) must reach the driver as None, not <NA>
+        df = df.astype(object).where(df.notna(), None)
+
         batch_size = 10000
         start_time = time.time()
-        with sessionmaker(bind=self.engine)() as session:
+        with profiler.stage("load"), sessionmaker(bind=self.engine)() as session:
             for i in range(0, len(df), batch_size):
                 batch = df.iloc[i : i + batch_size]
                 records = [Product(**row.to_dict()) for _, row in batch.iterrows()]
@@ -99,15 +216,78 @@ class ProductRepository(BaseRepository):
                 session.commit()
                 self.logger.info(f"Inserted {i + len(batch)}/{len(df)} records")
 
-        with self.engine.connect() as conn:
+        with profiler.stage("index"), self.engine.connect() as conn:
             conn.execute(text("CREATE INDEX idx_product_id ON products(product_id)"))
             conn.execute(
                 text("CREATE INDEX idx_product_type ON products(product_type_id)")
             )
+            conn.execute(
+                text(
+                    "CREATE INDEX idx_duplicate_cluster ON products(duplicate_cluster_id)"
+                )
+            )
             conn.commit()
 
         self.logger.info(f"Cleaned data saved to DB in {time.time() - start_time:.2f}s")
 
+    def _dataset_version(self, parquet_path):
+        """Fingerprint the raw Parquet so sketches are tied to the data they summarize"""
+        digest = hashlib.sha256()
+        with open(parquet_path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+        return digest.hexdigest()[:16]
+
+    def save_sketches(self, dataset_version, sketches):
+        """Persist per-type sketches for a dataset version.
+
+        Only the latest dataset version is kept: sketches from this and any older
+        version are deleted first, since the products table holds a single dataset.
+        """
+        ProductSketch.__table__.create(self.engine, checkfirst=True)
+        with sessionmaker(bind=self.engine)() as session:
+            session.query(ProductSketch).delete()
+            for product_type_id, sketch in sketches.items():
+                length_bytes, distinct_bytes = sketch.serialize()
+                session.add(
+                    ProductSketch(
+                        dataset_version=dataset_version,
+                        product_type_id=product_type_id,
+                        row_count=sketch.row_count,
+                        length_sketch=length_bytes,
+                        distinct_sketch=distinct_bytes,
+                    )
+                )
+            session.commit()
+        self.logger.info(
+            f"Saved sketches for {len(sketches)} product types (dataset version {dataset_version})"
+        )
+
+    def _backfill_sketches(self, parquet_path):
+        """Build sketches from the existing products table when ingestion is skipped"""
+        with self.engine.connect() as conn:
+            sketches_exist = conn.execute(
+                text(
+                    "SELECT EXISTS (SELECT FROM pg_tables WHERE tablename = 'product_sketches')"
+                )
+            ).scalar()
+            if sketches_exist and conn.execute(
+                text("SELECT EXISTS (SELECT FROM product_sketches)")
+            ).scalar():
+                return
+
+        self.logger.info("No sketches found. Building them from the products table...")
+        df = pd.read_sql(
+            text("SELECT title, product_type_id, product_length FROM products"),
+            self.engine,
+        )
+        dataset_version = (
+            self._dataset_version(parquet_path)
+            if os.path.exists(parquet_path)
+            else f"db-{len(df)}"
+        )
+        self.save_sketches(dataset_version, build_type_sketches(df))
+
     def save_raw_kaggle_data(self):
         """Ingest Kaggle data and save as Parquet with metadata"""
         with self.engine.connect() as conn:
@@ -120,10 +300,21 @@ class ProductRepository(BaseRepository):
             if table_exists:
                 result = conn.execute(text("SELECT COUNT(*) FROM products"))
                 count = result.scalar()
-                if count > 100000:
+                has_clusters = conn.execute(
+                    text(
+                        "SELECT EXISTS (SELECT FROM information_schema.columns "
+                        "WHERE table_name = 'products' AND column_name = 'duplicate_cluster_id')"
+                    )
+                ).scalar()
+                if not has_clusters:
+                    self.logger.info(
+                        "Products table predates duplicate detection. Proceeding with ingestion."
+                    )
+                elif count > 100000:
                     self.logger.info(
                         f"Products table already contains data ({count} records). Skipping ingestion."
                     )
+                    self._backfill_sketches("./data/processed/amazon_product_data.parquet")
                     return
             else:
                 self.logger.info(
@@ -138,6 +329,7 @@ class ProductRepository(BaseRepository):
             return
 
         self.logger.info("Starting Kaggle ingestion...")
+        profiler = StageProfiler()
         zip_path = "amazon-product-data.zip"
         csv_path = "./data/raw/dataset/train.csv"
 
@@ -145,14 +337,17 @@ class ProductRepository(BaseRepository):
             self.logger.info("Downloading from Kaggle...")
             os.environ["KAGGLE_KEY"] = os.getenv("KAGGLE_KEY")
             os.environ["KAGGLE_USERNAME"] = os.getenv("KAGGLE_USERNAME")
-            os.system("kaggle datasets download -d piyushjain16/amazon-product-data")
+            with profiler.stage("download"):
+                os.system("kaggle datasets download -d piyushjain16/amazon-product-data")
 
         if not os.path.exists(csv_path):
             self.logger.info("Unzipping dataset...")
-            os.system(f"unzip -o {zip_path} -d ./data/raw")
+            with profiler.stage("unzip"):
+                os.system(f"unzip -o {zip_path} -d ./data/raw")
 
         start_time = time.time()
-        df = pd.read_csv(csv_path)
+        with profiler.stage("read_csv"):
+            df = pd.read_csv(csv_path)
         df.columns = [col.lower() for col in df.columns]
         self.logger.info(f"Loaded {len(df)} rows in {time.time() - start_time:.2f}s")
 
@@ -168,10 +363,12 @@ class ProductRepository(BaseRepository):
         }
 
         os.makedirs(os.path.dirname(parquet_path), exist_ok=True)
-        table = pa.Table.from_pandas(df)
-        pq.write_table(table, parquet_path)
+        with profiler.stage("write_raw"):
+            table = pa.Table.from_pandas(df)
+            pq.write_table(table, parquet_path)
         self.logger.info(f"Saved to {parquet_path} in {time.time() - start_time:.2f}s")
-        self.clean_and_save_to_db(parquet_path)
+        self.clean_and_save_to_db(parquet_path, profiler)
+        self.save_ingestion_run(profiler)
 
     def product_distribution(self):
         """Query top 20 product distribution from the database."""
@@ -372,6 +569,135 @@ class ProductRepository(BaseRepository):
             self.logger.error(f"Error fetching density heatmap: {str(e)}")
             raise
 
+    def get_length_quantiles(self, ranks, product_type_id=None):
+        """Answer product_length quantiles and distinct counts per type from the stored sketches."""
+        try:
+            latest_version = (
+                self.session.query(ProductSketch.dataset_version)
+                .order_by(ProductSketch.created_at.desc())
+                .limit(1)
+                .scalar()
+            )
+            if latest_version is None:
+                self.logger.warning("No product sketches available.")
+                return {"dataset_version": None, "data": []}
+
+            query = self.session.query(ProductSketch).filter(
+                ProductSketch.dataset_version == latest_version
+            )
+            if product_type_id is not None:
+                query = query.filter(ProductSketch.product_type_id == product_type_id)
+
+            sketches = merge_type_sketches(
+                {
+                    row.product_type_id: ProductTypeSketch.deserialize(
+                        row.length_sketch, row.distinct_sketch, row.row_count
+                    )
+                }
+                for row in query.all()
+            )
+
+            result = [
+                {
+                    "product_type_id": type_id,
+                    "count": sketch.row_count,
+                    "distinct_titles": sketch.distinct_count(),
+                    "quantiles": sketch.quantiles(ranks),
+                }
+                for type_id, sketch in sorted(sketches.items())
+            ]
+            self.logger.debug(f"Returning length quantiles for {len(result)} product types")
+            return {"dataset_version": latest_version, "data": result}
+
+        except Exception as e:
+            self.logger.error(f"Error fetching length quantiles: {str(e)}")
+            raise
+
+    def get_duplicate_clusters(self, page: int = 1, page_size: int = 50):
+        """Fetch near-duplicate clusters, largest first, with pagination."""
+        try:
+            # Sizes come from idx_duplicate_cluster alone; titles are only read for the page
+            query = (
+                self.session.query(
+                    Product.duplicate_cluster_id,
+                    func.count().label("size"),
+                )
+                .filter(Product.duplicate_cluster_id.isnot(None))
+                .group_by(Product.duplicate_cluster_id)
+            )
+
+            total = query.count()
+            clusters = (
+                query.order_by(func.count().desc(), Product.duplicate_cluster_id)
+                .offset((page - 1) * page_size)
+                .limit(page_size)
+                .all()
+            )
+
+            sample_titles = dict(
+                self.session.query(Product.duplicate_cluster_id, func.min(Product.title))
+                .filter(
+                    Product.duplicate_cluster_id.in_(
+                        [row.duplicate_cluster_id for row in clusters]
+                    )
+                )
+                .group_by(Product.duplicate_cluster_id)
+                .all()
+            )
+
+            result = [
+                {
+                    "duplicate_cluster_id": row.duplicate_cluster_id,
+                    "size": row.size,
+                    "sample_title": sample_titles.get(row.duplicate_cluster_id),
+                }
+                for row in clusters
+            ]
+            self.logger.debug(
+                f"Returning {len(result)} duplicate clusters (page {page}, {page_size} per page, total {total})"
+            )
+            return {"data": result, "total": total}
+
+        except Exception as e:
+            self.logger.error(f"Error fetching duplicate clusters: {str(e)}")
+            raise
+
+    def get_similar_products(self, product_id: str, limit: int = 50):
+        """Fetch products in the same near-duplicate cluster as the given product.
+
+        Returns None when the product does not exist.
+        """
+        try:
+            product = (
+                self.session.query(Product.duplicate_cluster_id)
+                .filter(Product.product_id == product_id)
+                .first()
+            )
+            if product is None:
+                return None
+            if product.duplicate_cluster_id is None:
+                return {"duplicate_cluster_id": None, "data": []}
+
+            similar = (
+                self.session.query(Product)
+                .filter(
+                    Product.duplicate_cluster_id == product.duplicate_cluster_id,
+                    Product.product_id != product_id,
+                )
+                .limit(limit)
+                .all()
+            )
+
+            result = [row.to_dict() for row in similar]
+            self.logger.debug(
+                f"Returning {len(result)} products similar to {product_id}"
+            )
+            return {"duplicate_cluster_id": product.duplicate_cluster_id, "data": result}
+
+        except Exception as e:
+            self.logger.error(f"Error fetching similar products: {str(e)}")
+            raise
+
     def fetch_products(self, page=1, limit=10):
         """Fetch paginated products"""
         offset = (page - 1) * limit
@@ -1,7 +1,11 @@
+import time
 import pytz
-from flask import Blueprint, request, current_app
+from flask import Blueprint, request, current_app, g, has_request_context
+from sqlalchemy import event
+from config.database import engine
 from controllers.product_controller import product_controller
 from datetime import datetime
+from utils.profiling import should_profile, try_start_request_profile, finish_request_profile
 
 router = Blueprint('router', __name__)
 
@@ -16,3 +20,34 @@ def log_request_info():
     current_app.logger.info(f"Headers: {request.headers.get('User-Agent')}")
     current_app.logger.info(f"Body: {request.get_json(silent=True)}")
     current_app.logger.info(f"Query: {request.args}")
+
+@router.before_request
+def start_request_profile():
+    if should_profile(request.headers):
+        g.request_profile = try_start_request_profile(request.method, request.path)
+
+@router.after_request
+def stop_request_profile(response):
+    profile = g.pop('request_profile', None)
+    if profile is not None:
+        dump_path = finish_request_profile(profile)
+        current_app.logger.info(f"Profile for {request.path} written to {dump_path}")
+        response.headers['X-Profile-Id'] = profile.profile_id
+    return response
+
+@router.teardown_request
+def discard_request_profile(exc):
+    profile = g.pop('request_profile', None)
+    if profile is not None:
+        finish_request_profile(profile)
+
+@event.listens_for(engine, 'before_cursor_execute')
+def start_query_timer(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start_time', []).append(time.perf_counter())
+
+@event.listens_for(engine, 'after_cursor_execute')
+def record_profiled_query(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['query_start_time'].pop()
+    profile = g.get('request_profile') if has_request_context() else None
+    if profile is not None:
+        profile.record_query(statement, parameters, elapsed)
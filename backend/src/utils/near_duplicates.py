@@ -0,0 +1,136 @@
+import os
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+SHINGLE_SIZE = 3
+MAX_TOKENS = 64
+NUM_PERM = 64
+BANDS = 8
+ROWS_PER_BAND = NUM_PERM // BANDS
+SIMILARITY_THRESHOLD = 0.8
+BATCH_SIZE = 1000
+
+# Everything that changes which clusters come out; part of the cleaned-stage cache key
+CLUSTER_PARAMETERS = (
+    f"shingle={SHINGLE_SIZE},tokens={MAX_TOKENS},perm={NUM_PERM},"
+    f"bands={BANDS},threshold={SIMILARITY_THRESHOLD}"
+)
+
+MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+MAX_HASH = np.uint64((1 << 32) - 1)
+SHINGLE_MULTIPLIER = np.uint64(1000003)
+
+# Fixed seed so signatures computed in different worker processes are comparable
+_rng = np.random.RandomState(1)
+PERM_A = _rng.randint(1, np.iinfo(np.int64).max, size=NUM_PERM, dtype=np.int64).astype(np.uint64)
+PERM_B = _rng.randint(0, np.iinfo(np.int64).max, size=NUM_PERM, dtype=np.int64).astype(np.uint64)
+BAND_MULTIPLIERS = _rng.randint(1, np.iinfo(np.int64).max, size=ROWS_PER_BAND, dtype=np.int64).astype(np.uint64) | np.uint64(1)
+
+
+def batch_signatures(texts):
+    """MinHash signatures for a batch of texts.
+
+    Returns the positions (within the batch) of texts that have at least one
+    word shingle, and their NUM_PERM-wide uint32 signatures.
+    """
+    token_hashes = []
+    token_docs = []
+    for position, text in enumerate(texts):
+        tokens = text.split()[:MAX_TOKENS]
+        token_hashes.extend(zlib.crc32(token.encode()) for token in tokens)
+        token_docs.extend([position] * len(tokens))
+
+    hashes = np.array(token_hashes, dtype=np.uint64)
+    docs = np.array(token_docs, dtype=np.int64)
+    starts = np.arange(len(hashes) - SHINGLE_SIZE + 1)
+    if len(starts) == 0:
+        return np.empty(0, dtype=np.int64), np.empty((0, NUM_PERM), dtype=np.uint32)
+
+    # Keep only shingles whose tokens all belong to the same text
+    starts = starts[docs[starts] == docs[starts + SHINGLE_SIZE - 1]]
+    shingles = hashes[starts]
+    for offset in range(1, SHINGLE_SIZE):
+        shingles = shingles * SHINGLE_MULTIPLIER + hashes[starts + offset]
+    shingles &= MAX_HASH
+
+    permuted = (shingles[:, None] * PERM_A + PERM_B) % MERSENNE_PRIME & MAX_HASH
+    positions, first = np.unique(docs[starts], return_index=True)
+    if len(positions) == 0:
+        return positions, np.empty((0, NUM_PERM), dtype=np.uint32)
+    # Values are masked to 32 bits, so halve the memory shipped back from workers
+    return positions, np.minimum.reduceat(permuted, first, axis=0).astype(np.uint32)
+
+
+def compute_signatures(texts, workers=None):
+    """Compute MinHash signatures in batches, spread across processes."""
+    batches = [texts[i : i + BATCH_SIZE] for i in range(0, len(texts), BATCH_SIZE)]
+    if len(batches) <= 1:
+        results = [batch_signatures(batch) for batch in batches]
+    else:
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+            results = list(executor.map(batch_signatures, batches))
+
+    positions = [
+        batch_positions + i * BATCH_SIZE for i, (batch_positions, _) in enumerate(results)
+    ]
+    if not positions:
+        return np.empty(0, dtype=np.int64), np.empty((0, NUM_PERM), dtype=np.uint32)
+    return np.concatenate(positions), np.concatenate([sig for _, sig in results])
+
+
+def lsh_candidate_pairs(signatures):
+    """Bucket signatures band by band and keep pairs whose estimated Jaccard passes the threshold."""
+    n = len(signatures)
+    left, right = [], []
+    for band in range(BANDS):
+        rows = signatures[:, band * ROWS_PER_BAND : (band + 1) * ROWS_PER_BAND]
+        keys = (rows.astype(np.uint64) * BAND_MULTIPLIERS).sum(axis=1)
+        _, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+        leaders = first[inverse.ravel()]
+        members = np.nonzero(leaders != np.arange(n))[0]
+        left.append(members)
+        right.append(leaders[members])
+
+    left = np.concatenate(left) if left else np.empty(0, dtype=np.int64)
+    right = np.concatenate(right) if right else np.empty(0, dtype=np.int64)
+    keep = np.empty(len(left), dtype=bool)
+    for i in range(0, len(left), 100000):
+        similarity = (signatures[left[i : i + 100000]] == signatures[right[i : i + 100000]]).mean(axis=1)
+        keep[i : i + 100000] = similarity >= SIMILARITY_THRESHOLD
+    return left[keep], right[keep]
+
+
+def connected_components(n, left, right):
+    """Label each node with the smallest node index in its component."""
+    labels = np.arange(n)
+    while True:
+        lowest = np.minimum(labels[left], labels[right])
+        updated = labels.copy()
+        np.minimum.at(updated, left, lowest)
+        np.minimum.at(updated, right, lowest)
+        updated = updated[updated]
+        if np.array_equal(updated, labels):
+            return labels
+        labels = updated
+
+
+def assign_duplicate_clusters(texts, workers=None):
+    """Assign a duplicate_cluster_id to every near-duplicate text, <NA> for unique ones.
+
+    Texts shorter than SHINGLE_SIZE words have no shingles and are never clustered.
+    """
+    texts = list(texts)
+    clusters = pd.array([pd.NA] * len(texts), dtype="Int64")
+
+    positions, signatures = compute_signatures(texts, workers)
+    left, right = lsh_candidate_pairs(signatures)
+    labels = connected_components(len(positions), left, right)
+
+    sizes = np.bincount(labels, minlength=len(positions))
+    duplicated = sizes[labels] > 1
+    _, cluster_ids = np.unique(labels[duplicated], return_inverse=True)
+    clusters[positions[duplicated]] = cluster_ids.ravel() + 1
+    return clusters
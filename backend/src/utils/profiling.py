@@ -0,0 +1,183 @@
+import cProfile
+import hmac
+import json
+import os
+import random
+import resource
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+
+PROFILE_DIR = os.getenv('PROFILE_DIR', './data/profiles')
+PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', 0))
+PROFILE_MAX_DUMPS = int(os.getenv('PROFILE_MAX_DUMPS', 50))
+# X-Profile is only honored when it carries this shared token; unset disables it
+PROFILE_TOKEN = os.getenv('PROFILE_TOKEN')
+PROFILE_HEADER = 'X-Profile'
+
+# cProfile hooks are process-wide on Python 3.12+, so only one request is profiled at a time
+_request_profile_lock = threading.Lock()
+
+
+def _rss_mb():
+    """Current resident set size, falling back to the lifetime peak where /proc is unavailable."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1024 / 1024
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _reset_peak_rss():
+    """Reset the kernel's peak RSS (VmHWM) to the current RSS; False where Linux does not allow it."""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def _peak_rss_mb():
+    """Peak resident set size since the last _reset_peak_rss(), or None if unavailable."""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+class StageProfiler:
+    """Stage-by-stage wall time and memory breakdown of an ingestion run."""
+
+    def __init__(self):
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        self.stages = []
+        self.metadata = {}
+
+    @contextmanager
+    def stage(self, name):
+        rss_before = _rss_mb()
+        peak_tracked = _reset_peak_rss()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            record = {
+                'stage': name,
+                'seconds': round(time.perf_counter() - start, 3),
+                'rss_mb_before': round(rss_before, 1),
+                'rss_mb_after': round(_rss_mb(), 1),
+            }
+            # Peak of this stage alone; omitted rather than reporting the process-lifetime peak.
+            # Worker processes (e.g. MinHash signatures) are not included.
+            peak = _peak_rss_mb() if peak_tracked else None
+            if peak is not None:
+                record['peak_rss_mb'] = round(peak, 1)
+            self.stages.append(record)
+
+    @property
+    def wall_seconds(self):
+        """Elapsed time since the run started, including work outside any stage."""
+        return round(time.perf_counter() - self._start, 3)
+
+    @property
+    def stage_seconds(self):
+        return round(sum(stage['seconds'] for stage in self.stages), 3)
+
+
+class RequestProfile:
+    """cProfile capture of a single request together with the SQL it issued."""
+
+    def __init__(self, method, path):
+        self.profile_id = uuid.uuid4().hex[:12]
+        self.method = method
+        self.path = path
+        self.thread_id = threading.get_ident()
+        self.profiler = cProfile.Profile()
+        self.queries = []
+        self.elapsed = None
+
+    def start(self):
+        self._start = time.perf_counter()
+        self.profiler.enable()
+
+    def stop(self):
+        self.profiler.disable()
+        self.elapsed = time.perf_counter() - self._start
+
+    def record_query(self, statement, parameters, seconds):
+        self.queries.append({
+            'statement': statement,
+            'parameters': repr(parameters),
+            'seconds': round(seconds, 6),
+        })
+
+    def dump(self, directory=PROFILE_DIR):
+        """Write <id>.prof (pstats, viewable with snakeviz or flameprof) and <id>.json with the SQL."""
+        os.makedirs(directory, exist_ok=True)
+        base = os.path.join(directory, f"{datetime.now().strftime('%Y%m%dT%H%M%S%f')}_{self.profile_id}")
+        self.profiler.dump_stats(f"{base}.prof")
+        with open(f"{base}.json", 'w') as f:
+            json.dump({
+                'profile_id': self.profile_id,
+                'method': self.method,
+                'path': self.path,
+                'thread_id': self.thread_id,
+                # cProfile hooks every thread on 3.12+, so the .prof may include frames
+                # from requests served concurrently; the SQL list is this request's only
+                'captures_all_threads': sys.version_info >= (3, 12),
+                'seconds': round(self.elapsed, 6),
+                'sql_seconds': round(sum(q['seconds'] for q in self.queries), 6),
+                'queries': self.queries,
+            }, f, indent=2)
+        _prune_dumps(directory)
+        return base
+
+
+def _prune_dumps(directory, keep=PROFILE_MAX_DUMPS):
+    """Keep only the newest `keep` profiles (each a .prof and .json pair)."""
+    dumps = sorted(
+        {os.path.splitext(entry)[0] for entry in os.listdir(directory) if entry.endswith(('.prof', '.json'))},
+        reverse=True,
+    )
+    for base in dumps[keep:]:
+        for extension in ('.prof', '.json'):
+            path = os.path.join(directory, base + extension)
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def should_profile(headers):
+    requested = headers.get(PROFILE_HEADER)
+    if PROFILE_TOKEN and requested and hmac.compare_digest(requested.encode(), PROFILE_TOKEN.encode()):
+        return True
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+
+def try_start_request_profile(method, path):
+    """Start profiling unless another request is already being profiled."""
+    if not _request_profile_lock.acquire(blocking=False):
+        return None
+    profile = RequestProfile(method, path)
+    try:
+        profile.start()
+    except Exception:
+        _request_profile_lock.release()
+        raise
+    return profile
+
+
+def finish_request_profile(profile):
+    try:
+        profile.stop()
+        return profile.dump()
+    finally:
+        _request_profile_lock.release()
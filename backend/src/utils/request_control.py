@@ -0,0 +1,84 @@
+import threading
+from contextlib import contextmanager
+
+
+class OverloadedError(Exception):
+    """Raised when a request is shed instead of queued behind the database."""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Coalesce concurrent calls with the same key into one in-flight computation.
+
+    At most max_waiters callers may wait on a key; further ones are shed.
+    """
+
+    def __init__(self, max_waiters=None):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.max_waiters = max_waiters
+
+    def do(self, key, fn, wait_timeout, retry_after):
+        with self._lock:
+            call = self._calls.get(key)
+            is_leader = call is None
+            if is_leader:
+                call = _Call()
+                self._calls[key] = call
+            elif self.max_waiters is not None and call.waiters >= self.max_waiters:
+                raise OverloadedError(f"Too many requests waiting for in-flight {key}", retry_after)
+            else:
+                call.waiters += 1
+
+        if not is_leader:
+            try:
+                finished = call.done.wait(wait_timeout)
+            finally:
+                with self._lock:
+                    call.waiters -= 1
+            if not finished:
+                raise OverloadedError(f"Timed out waiting for in-flight {key}", retry_after)
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+
+class ConcurrencyLimiter:
+    """Bound concurrent executions and shed load once the queue wait runs out."""
+
+    def __init__(self, name, max_concurrent, queue_timeout, retry_after):
+        self.name = name
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self._semaphore = threading.BoundedSemaphore(max_concurrent)
+
+    @contextmanager
+    def slot(self):
+        if not self._semaphore.acquire(timeout=self.queue_timeout):
+            raise OverloadedError(f"Too many concurrent {self.name} requests", self.retry_after)
+        try:
+            yield
+        finally:
+            self._semaphore.release()
@@ -0,0 +1,71 @@
+import numpy as np
+from datasketches import hll_sketch, hll_union, kll_floats_sketch, tgt_hll_type
+
+KLL_K = 200
+HLL_LG_K = 12
+
+
+class ProductTypeSketch:
+    """Mergeable summary of one product type: KLL for product_length quantiles
+    and HyperLogLog for distinct title counts."""
+
+    def __init__(self, length_sketch=None, distinct_sketch=None, row_count=0):
+        self.length_sketch = length_sketch or kll_floats_sketch(KLL_K)
+        self.distinct_sketch = distinct_sketch or hll_sketch(HLL_LG_K, tgt_hll_type.HLL_4)
+        self.row_count = row_count
+
+    def update(self, lengths, titles):
+        self.length_sketch.update(np.asarray(lengths, dtype=np.float32))
+        for title in titles:
+            self.distinct_sketch.update(str(title))
+        self.row_count += len(lengths)
+
+    def merge(self, other):
+        self.length_sketch.merge(other.length_sketch)
+        union = hll_union(HLL_LG_K)
+        union.update(self.distinct_sketch)
+        union.update(other.distinct_sketch)
+        self.distinct_sketch = union.get_result(tgt_hll_type.HLL_4)
+        self.row_count += other.row_count
+        return self
+
+    def quantiles(self, ranks):
+        if self.row_count == 0:
+            return {str(rank): None for rank in ranks}
+        return {str(rank): self.length_sketch.get_quantile(rank) for rank in ranks}
+
+    def distinct_count(self):
+        return round(self.distinct_sketch.get_estimate())
+
+    def serialize(self):
+        return self.length_sketch.serialize(), self.distinct_sketch.serialize_compact()
+
+    @classmethod
+    def deserialize(cls, length_bytes, distinct_bytes, row_count):
+        return cls(
+            kll_floats_sketch.deserialize(bytes(length_bytes)),
+            hll_sketch.deserialize(bytes(distinct_bytes)),
+            row_count,
+        )
+
+
+def build_type_sketches(df):
+    """Build one sketch per product_type_id from a cleaned products DataFrame."""
+    sketches = {}
+    for product_type_id, group in df.groupby("product_type_id"):
+        sketch = ProductTypeSketch()
+        sketch.update(group["product_length"].to_numpy(), group["title"].to_numpy())
+        sketches[int(product_type_id)] = sketch
+    return sketches
+
+
+def merge_type_sketches(partitions):
+    """Merge per-type sketches built over several partitions or incremental loads."""
+    merged = {}
+    for sketches in partitions:
+        for product_type_id, sketch in sketches.items():
+            if product_type_id in merged:
+                merged[product_type_id].merge(sketch)
+            else:
+                merged[product_type_id] = sketch
+    return merged
@@ -0,0 +1,89 @@
+import threading
+
+import pytest
+
+pytest.importorskip("flasgger")
+pytest.importorskip("datasketches")
+
+from flask import Flask
+
+import controllers.product_controller as product_controller_module
+from controllers.product_controller import ProductController
+
+
+class SlowRepository:
+    """Aggregate queries that block until released, so requests pile up behind them."""
+
+    def __init__(self):
+        self.started = {"temporal-trend": threading.Event(), "density-heatmap": threading.Event()}
+        self.release = threading.Event()
+        self.calls = []
+
+    def _slow(self, endpoint):
+        self.calls.append(endpoint)
+        self.started[endpoint].set()
+        self.release.wait(5)
+        return {"data": [endpoint]}
+
+    def get_temporal_trend(self):
+        return self._slow("temporal-trend")
+
+    def get_density_heatmap(self):
+        return self._slow("density-heatmap")
+
+
+@pytest.fixture
+def client_factory(monkeypatch):
+    monkeypatch.setattr(product_controller_module, "AGGREGATE_MAX_CONCURRENCY", 1)
+    monkeypatch.setattr(product_controller_module, "AGGREGATE_QUEUE_TIMEOUT", 0.1)
+    monkeypatch.setattr(product_controller_module, "AGGREGATE_RETRY_AFTER", 7)
+    monkeypatch.setattr(product_controller_module, "AGGREGATE_MAX_WAITERS", 2)
+
+    repository = SlowRepository()
+    app = Flask(__name__)
+    app.register_blueprint(ProductController(repository).blueprint, url_prefix="/products")
+    return repository, app.test_client
+
+
+def get_in_background(client_factory, path, responses):
+    thread = threading.Thread(target=lambda: responses.append(client_factory().get(path)))
+    thread.start()
+    return thread
+
+
+def test_aggregate_endpoints_share_one_pool(client_factory):
+    repository, make_client = client_factory
+    responses = []
+    leader = get_in_background(make_client, "/products/temporal-trend", responses)
+    repository.started["temporal-trend"].wait(5)
+    try:
+        shed = make_client().get("/products/density-heatmap")
+    finally:
+        repository.release.set()
+        leader.join()
+
+    assert shed.status_code == 503
+    assert shed.headers["Retry-After"] == "7"
+    assert repository.calls == ["temporal-trend"]
+    assert [r.status_code for r in responses] == [200]
+
+
+def test_followers_beyond_the_cap_are_shed(client_factory):
+    repository, make_client = client_factory
+    responses = []
+    leader = get_in_background(make_client, "/products/temporal-trend", responses)
+    repository.started["temporal-trend"].wait(5)
+    followers = [
+        get_in_background(make_client, f"/products/temporal-trend?_={i}", responses) for i in range(5)
+    ]
+    # Give the followers time to either join the in-flight call or be shed
+    for follower in followers:
+        follower.join(0.5)
+    repository.release.set()
+    for thread in [leader, *followers]:
+        thread.join()
+
+    statuses = sorted(r.status_code for r in responses)
+    assert statuses == [200, 200, 200, 503, 503, 503]
+    assert all(r.headers["Retry-After"] == "7" for r in responses if r.status_code == 503)
+    assert repository.calls == ["temporal-trend"]
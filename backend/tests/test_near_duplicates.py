@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+
+from utils.near_duplicates import (
+    BATCH_SIZE,
+    assign_duplicate_clusters,
+    batch_signatures,
+    compute_signatures,
+    connected_components,
+)
+
+
+def test_shingles_do_not_cross_document_boundaries():
+    positions, signatures = batch_signatures(["alpha beta", "gamma delta epsilon"])
+    _, alone = batch_signatures(["gamma delta epsilon"])
+
+    # "alpha beta gamma" and "beta gamma delta" would only exist across the boundary
+    assert positions.tolist() == [1]
+    np.testing.assert_array_equal(signatures, alone)
+
+
+def test_near_identical_texts_share_a_cluster():
+    base = "stainless steel water bottle with insulated lid keeps drinks cold for twenty four hours"
+    texts = [
+        base,
+        base + " blue",
+        "wireless ergonomic keyboard with backlit keys and a rechargeable battery for office use",
+    ]
+    clusters = assign_duplicate_clusters(texts, workers=1)
+
+    assert clusters[0] is not pd.NA
+    assert clusters[0] == clusters[1]
+    assert clusters[2] is pd.NA
+
+
+def test_texts_under_shingle_size_are_skipped():
+    texts = ["usb cable", "usb cable", "", "usb"]
+    positions, _ = batch_signatures(texts)
+    clusters = assign_duplicate_clusters(texts, workers=1)
+
+    assert positions.size == 0
+    assert clusters.isna().all()
+
+
+def test_connected_components_merges_a_chain():
+    left = np.array([4, 3, 2, 1])
+    right = np.array([3, 2, 1, 0])
+    labels = connected_components(6, left, right)
+
+    assert labels.tolist() == [0, 0, 0, 0, 0, 5]
+
+
+def test_signatures_do_not_depend_on_worker_count():
+    rng = np.random.default_rng(3)
+    words = [f"word{i}" for i in range(500)]
+    texts = [" ".join(rng.choice(words, size=12)) for _ in range(BATCH_SIZE * 2 + 300)]
+    texts[5] = "too short"
+
+    serial_positions, serial_signatures = compute_signatures(texts, workers=1)
+    parallel_positions, parallel_signatures = compute_signatures(texts, workers=3)
+
+    assert 5 not in serial_positions
+    np.testing.assert_array_equal(serial_positions, parallel_positions)
+    np.testing.assert_array_equal(serial_signatures, parallel_signatures)
@@ -0,0 +1,26 @@
+import pytest
+
+from utils.profiling import StageProfiler, _reset_peak_rss
+
+
+def touch_megabytes(megabytes):
+    block = bytearray(megabytes * 1024 * 1024)
+    block[::4096] = b"x" * len(block[::4096])
+    return block
+
+
+def test_peak_rss_is_per_stage():
+    if not _reset_peak_rss():
+        pytest.skip("/proc/self/clear_refs is not writable here")
+    profiler = StageProfiler()
+    with profiler.stage("large"):
+        touch_megabytes(200)
+    with profiler.stage("small"):
+        kept = touch_megabytes(10)
+
+    large, small = profiler.stages
+    assert large["peak_rss_mb"] >= large["rss_mb_before"] + 190
+    # The large stage's peak must not leak into the next stage
+    assert small["peak_rss_mb"] < large["peak_rss_mb"] - 150
+    assert small["peak_rss_mb"] >= small["rss_mb_after"]
+    del kept
@@ -0,0 +1,151 @@
+import threading
+import time
+
+import pytest
+
+from utils.request_control import ConcurrencyLimiter, OverloadedError, SingleFlight
+
+
+def run_concurrently(target, count):
+    results, errors = [], []
+
+    def worker():
+        try:
+            results.append(target())
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, errors
+
+
+def test_concurrent_callers_share_one_call():
+    single_flight = SingleFlight()
+    calls = []
+    release = threading.Event()
+
+    def fetch():
+        calls.append(1)
+        release.wait(5)
+        return {"data": [1, 2, 3]}
+
+    threading.Timer(0.2, release.set).start()
+    results, errors = run_concurrently(
+        lambda: single_flight.do("temporal-trend", fetch, wait_timeout=5, retry_after=1), 10
+    )
+
+    assert not errors
+    assert len(calls) == 1
+    assert results == [{"data": [1, 2, 3]}] * 10
+
+
+def test_leader_error_reaches_every_waiter():
+    single_flight = SingleFlight()
+    release = threading.Event()
+
+    def fetch():
+        release.wait(5)
+        raise RuntimeError("database unavailable")
+
+    threading.Timer(0.2, release.set).start()
+    results, errors = run_concurrently(
+        lambda: single_flight.do("density-heatmap", fetch, wait_timeout=5, retry_after=1), 8
+    )
+
+    assert not results
+    assert len(errors) == 8
+    assert all(isinstance(e, RuntimeError) and str(e) == "database unavailable" for e in errors)
+
+
+def test_calls_after_completion_recompute():
+    single_flight = SingleFlight()
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        return len(calls)
+
+    assert single_flight.do("key", fetch, wait_timeout=1, retry_after=1) == 1
+    assert single_flight.do("key", fetch, wait_timeout=1, retry_after=1) == 2
+
+
+def test_queue_timeout_raises_overloaded_with_retry_after():
+    limiter = ConcurrencyLimiter("density-heatmap", 1, queue_timeout=0.1, retry_after=7)
+    holding = threading.Event()
+    release = threading.Event()
+
+    def hold_slot():
+        with limiter.slot():
+            holding.set()
+            release.wait(5)
+
+    holder = threading.Thread(target=hold_slot)
+    holder.start()
+    holding.wait(5)
+    try:
+        started = time.monotonic()
+        with pytest.raises(OverloadedError) as excinfo:
+            with limiter.slot():
+                pass
+        assert time.monotonic() - started >= 0.1
+        assert excinfo.value.retry_after == 7
+    finally:
+        release.set()
+        holder.join()
+
+    with limiter.slot():
+        pass
+
+
+def test_waiter_timeout_raises_overloaded_with_retry_after():
+    single_flight = SingleFlight()
+    leader_started = threading.Event()
+    release = threading.Event()
+
+    def slow_fetch():
+        leader_started.set()
+        release.wait(5)
+        return "done"
+
+    leader = threading.Thread(
+        target=lambda: single_flight.do("temporal-trend", slow_fetch, wait_timeout=5, retry_after=1)
+    )
+    leader.start()
+    leader_started.wait(5)
+    try:
+        with pytest.raises(OverloadedError) as excinfo:
+            single_flight.do("temporal-trend", slow_fetch, wait_timeout=0.1, retry_after=3)
+        assert excinfo.value.retry_after == 3
+    finally:
+        release.set()
+        leader.join()
+
+
+def test_waiters_beyond_the_cap_are_shed():
+    single_flight = SingleFlight(max_waiters=2)
+    leader_started = threading.Event()
+    release = threading.Event()
+
+    def slow_fetch():
+        leader_started.set()
+        release.wait(5)
+        return "done"
+
+    leader = threading.Thread(
+        target=lambda: single_flight.do("temporal-trend", slow_fetch, wait_timeout=5, retry_after=1)
+    )
+    leader.start()
+    leader_started.wait(5)
+    threading.Timer(0.2, release.set).start()
+    results, errors = run_concurrently(
+        lambda: single_flight.do("temporal-trend", slow_fetch, wait_timeout=5, retry_after=4), 5
+    )
+    leader.join()
+
+    assert results == ["done", "done"]
+    assert len(errors) == 3
+    assert all(isinstance(e, OverloadedError) and e.retry_after == 4 for e in errors)
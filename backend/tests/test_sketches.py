@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("datasketches")
+
+from utils.sketches import (  # noqa: E402
+    ProductTypeSketch,
+    build_type_sketches,
+    merge_type_sketches,
+)
+
+
+@pytest.fixture
+def products():
+    rng = np.random.default_rng(7)
+    rows = 20000
+    return pd.DataFrame({
+        "product_type_id": rng.integers(0, 3, size=rows),
+        "product_length": rng.uniform(0, 1000, size=rows),
+        "title": [f"title {i % 5000}" for i in range(rows)],
+    })
+
+
+def test_merged_partitions_match_single_build(products):
+    single = build_type_sketches(products)
+    merged = merge_type_sketches([
+        build_type_sketches(products.iloc[:7000]),
+        build_type_sketches(products.iloc[7000:]),
+    ])
+
+    assert merged.keys() == single.keys()
+    for product_type_id, sketch in merged.items():
+        group = products[products["product_type_id"] == product_type_id]
+        assert sketch.row_count == single[product_type_id].row_count == len(group)
+
+        exact = np.quantile(group["product_length"], [0.5, 0.9])
+        for rank, expected in zip(("0.5", "0.9"), exact):
+            # Uniform lengths over 0..1000, so 3% rank error is at most 30 length units
+            assert sketch.quantiles([0.5, 0.9])[rank] == pytest.approx(expected, abs=30)
+            assert single[product_type_id].quantiles([0.5, 0.9])[rank] == pytest.approx(expected, abs=30)
+
+        distinct = group["title"].nunique()
+        assert sketch.distinct_count() == pytest.approx(distinct, rel=0.05)
+        assert single[product_type_id].distinct_count() == pytest.approx(distinct, rel=0.05)
+
+
+def test_serialized_sketch_round_trips(products):
+    sketch = build_type_sketches(products)[0]
+    restored = ProductTypeSketch.deserialize(*sketch.serialize(), sketch.row_count)
+
+    assert restored.row_count == sketch.row_count
+    assert restored.distinct_count() == sketch.distinct_count()
+    assert restored.quantiles([0.1, 0.5]) == sketch.quantiles([0.1, 0.5])